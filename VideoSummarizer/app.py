@@ -1,12 +1,62 @@
 import streamlit as st
+import contextlib
 import os
+import re
+import shutil
 import tempfile
-import time
-from video_processor import VideoProcessor
-from pdf_generator import PDFGenerator
-from ad_analyzer import AdAnalyzer
-from video_compressor import VideoCompressor
-from utils import format_time, validate_video_file, get_file_size_mb
+from concurrent.futures import ThreadPoolExecutor
+from utils import format_time, validate_video_header, get_file_size_mb, ThrottledProgress, AUDIO_SUFFIX
+
+# Characters stripped from download filenames
+_SAFE_RE = re.compile(r'[^\w\- ]+')
+
+# Uploads up to this size are kept on a RAM-backed filesystem when available
+_SPOOL_MAX_BYTES = 32 * 1024 * 1024
+_SPOOL_DIR = '/dev/shm' if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK) else None
+# Free tmpfs space to leave beyond the upload itself; /dev/shm is small and shared
+_SPOOL_HEADROOM_BYTES = 16 * 1024 * 1024
+
+def _spool_dir(size):
+    """Directory for an upload of `size` bytes: tmpfs if it fits, else the default temp dir."""
+    if _SPOOL_DIR is None or size > _SPOOL_MAX_BYTES:
+        return None
+    try:
+        fs = os.statvfs(_SPOOL_DIR)
+    except OSError:
+        return None
+    if fs.f_bavail * fs.f_frsize < size + _SPOOL_HEADROOM_BYTES:
+        return None
+    return _SPOOL_DIR
+
+def _copy_upload(uploaded_file, tmp_file):
+    """Copy the upload from its start into `tmp_file` in 4 MB chunks."""
+    uploaded_file.seek(0)
+    shutil.copyfileobj(uploaded_file, tmp_file, length=4 * 1024 * 1024)
+    tmp_file.flush()
+
+@st.cache_resource
+def get_video_processor():
+    """Shared VideoProcessor instance, reused across reruns and sessions."""
+    from video_processor import VideoProcessor
+    return VideoProcessor()
+
+@st.cache_resource
+def get_pdf_generator():
+    """Shared PDFGenerator instance, reused across reruns and sessions."""
+    from pdf_generator import PDFGenerator
+    return PDFGenerator()
+
+@st.cache_resource
+def get_ad_analyzer():
+    """Shared AdAnalyzer instance, reused across reruns and sessions."""
+    from ad_analyzer import AdAnalyzer
+    return AdAnalyzer()
+
+@st.cache_resource
+def get_video_compressor():
+    """Shared VideoCompressor instance, reused across reruns and sessions."""
+    from video_compressor import VideoCompressor
+    return VideoCompressor()
 
 st.set_page_config(
     page_title="Video Ad Intelligence Analyzer",
@@ -24,10 +74,6 @@ if 'processing' not in st.session_state:
 if 'processed_data' not in st.session_state:
     st.session_state.processed_data = None
 
-# Reduce idle CPU usage when not processing
-if not st.session_state.processing:
-    time.sleep(0.1)  # Small delay to reduce CPU cycles
-
 # File upload section
 st.header("🎯 Upload Your Video Ad")
 st.markdown("**Get instant intelligence on any video ad.** Upload and watch our AI dissect the psychology, triggers, and frameworks that drive conversions.")
@@ -54,11 +100,16 @@ except Exception as e:
 
 if uploaded_file is not None:
     # Validate file size (100MB limit with auto-compression)
-    file_size_mb = len(uploaded_file.getvalue()) / (1024 * 1024)
+    file_size_mb = uploaded_file.size / (1024 * 1024)
+    
+    # Validate the container from its header only
+    is_valid_video, header_info = validate_video_header(uploaded_file)
     
     if file_size_mb > 150:
         st.error(f"File size ({file_size_mb:.1f}MB) exceeds the 150MB limit. Please upload a smaller file.")
         st.info("💡 **Quick fix:** Videos over 150MB are typically very long or high resolution. Try reducing length or quality.")
+    elif not is_valid_video:
+        st.error(f"🚫 {header_info}. Please upload a valid MP4 or MOV file.")
     else:
         st.success(f"Video locked and loaded! Size: {file_size_mb:.1f}MB")
         
@@ -86,48 +137,89 @@ if uploaded_file is not None:
             st.session_state.processed_data = None
             
             # Create progress indicators
-            progress_bar = st.progress(0)
+            progress_bar = ThrottledProgress(st.progress(0))
             status_text = st.empty()
             
-            video_path = None
+            # Owns every temporary file created for this run
+            cleanup = contextlib.ExitStack()
             try:
                 # Save uploaded file to temporary location with correct extension
                 file_extension = os.path.splitext(uploaded_file.name)[1].lower()
                 if file_extension not in ['.mp4', '.mov']:
                     file_extension = '.mp4'  # Default fallback
                 
-                with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as tmp_file:
-                    tmp_file.write(uploaded_file.getvalue())
-                    temp_video_path = tmp_file.name
+                # ffmpeg needs a real path, so small files go to tmpfs rather than an in-process buffer
+                spool_dir = _spool_dir(uploaded_file.size)
+                tmp_file = cleanup.enter_context(tempfile.NamedTemporaryFile(suffix=file_extension, dir=spool_dir))
+                try:
+                    _copy_upload(uploaded_file, tmp_file)
+                except OSError:
+                    if spool_dir is None:
+                        raise
+                    # tmpfs filled up (e.g. by concurrent sessions); fall back to disk
+                    tmp_file.close()
+                    tmp_file = cleanup.enter_context(tempfile.NamedTemporaryFile(suffix=file_extension))
+                    _copy_upload(uploaded_file, tmp_file)
+                original_size_mb = tmp_file.tell() / (1024 * 1024)
+                temp_video_path = tmp_file.name
                 
                 # Initialize processors only when needed (lazy loading)
                 status_text.text("🔧 Initializing processors...")
-                video_processor = VideoProcessor()
-                pdf_generator = PDFGenerator()
-                ad_analyzer = AdAnalyzer()
-                video_compressor = VideoCompressor()
+                video_processor = get_video_processor()
+                pdf_generator = get_pdf_generator()
+                ad_analyzer = get_ad_analyzer()
+                video_compressor = get_video_compressor()
+                
+                # Determine processing mode
+                transcribe_only = transcribe_button
+                
+                # Frames and audio are written here when compression produces them
+                # in the same ffmpeg pass
+                assets_dir = cleanup.enter_context(tempfile.TemporaryDirectory())
+                audio_path = os.path.join(assets_dir, "audio" + AUDIO_SUFFIX)
+                # Set only once compression succeeds; a failed encode may leave
+                # partial frames and truncated audio behind
+                frames_dir = None
+                compressed_audio_path = None
                 
-                # Check file size and compress if needed
-                original_size_mb = get_file_size_mb(temp_video_path)
-                if original_size_mb > 25:
+                # Compress if needed; well-compressed H.264 only needs trimming
+                if original_size_mb > 25 and video_compressor.needs_compression(temp_video_path):
                     status_text.text(f"📦 Compressing video ({original_size_mb:.1f}MB → target: 45MB)...")
-                    video_path = video_compressor.compress_video(temp_video_path, target_size_mb=45)
+                    video_path = video_compressor.compress_video(
+                        temp_video_path, target_size_mb=45,
+                        frames_dir=None if transcribe_only else assets_dir, fps=0.5,
+                        audio_path=audio_path
+                    )
+                    if video_path != temp_video_path:
+                        frames_dir = assets_dir
+                        compressed_audio_path = audio_path
                     compressed_size_mb = get_file_size_mb(video_path)
-                    status_text.text(f"✅ Compression complete: {original_size_mb:.1f}MB → {compressed_size_mb:.1f}MB")
-                    time.sleep(1)  # Brief pause to show compression result
+                    status_text.success(f"✅ Compression complete: {original_size_mb:.1f}MB → {compressed_size_mb:.1f}MB")
+                elif original_size_mb > 25:
+                    status_text.text("✂️ Video is already well compressed, trimming to the first 5 minutes...")
+                    video_path = video_compressor.trim_video(temp_video_path, max_duration_seconds=300)
                 else:
                     video_path = temp_video_path
                 
-                # Determine processing mode
-                transcribe_only = transcribe_button if 'transcribe_button' in locals() else False
+                if video_path != temp_video_path:
+                    cleanup.callback(os.unlink, video_path)
+                
+                # Start transcription in the background; Whisper is network-bound so it
+                # overlaps with ffmpeg frame extraction on the main thread
+                transcription_executor = ThreadPoolExecutor(max_workers=1)
+                transcribe_future = transcription_executor.submit(video_processor.transcribe_audio, video_path, compressed_audio_path)
+                # A running transcription cannot be cancelled, so cleanup waits for it
+                # before the video and assets it reads are removed
+                cleanup.callback(transcription_executor.shutdown)
                 
                 frames_data = []
                 if not transcribe_only:
                     # Step 1: Extract frames (only for full analysis)
                     status_text.text("🎬 Extracting key frames...")
                     progress_bar.progress(20)
+                    progress_bar.flush()
                     
-                    frames_data = video_processor.extract_frames(video_path, fps=0.5)  # 1 frame every 2 seconds
+                    frames_data = video_processor.extract_frames(video_path, fps=0.5, frames_dir=frames_dir)  # 1 frame every 2 seconds
                     
                     if not frames_data:
                         st.error("Failed to extract frames from the video. Please ensure the file is a valid video.")
@@ -137,19 +229,26 @@ if uploaded_file is not None:
                     # Skip frame extraction for transcription-only
                     progress_bar.progress(30)
                 
-                # Step 2: Transcribe audio
+                # Step 2: Wait for audio transcription
                 status_text.text("🎤 Extracting speech patterns...")
                 progress_bar.progress(50)
-                
-                transcript_data = video_processor.transcribe_audio(video_path)
+                progress_bar.flush()
                 
                 # Handle transcription errors but continue with PDF generation
-                if not transcript_data or "failed" in transcript_data.lower() or "recognition failed" in transcript_data.lower():
-                    st.warning("⚠️ Audio transcription failed. Continuing with visual-only analysis.")
+                from video_processor import TranscriptionFailed, AudioUnclear
+                try:
+                    transcript_data = transcribe_future.result()
+                except AudioUnclear as e:
+                    # Silent or speechless videos are expected; the message is the transcript
+                    st.info(f"🔇 {e} Continuing with visual-only analysis.")
+                    transcript_data = str(e)
+                except TranscriptionFailed as e:
+                    st.warning(f"⚠️ Audio transcription failed ({e}). Continuing with visual-only analysis.")
                     transcript_data = "Transcript unavailable: Audio transcription failed. This could be due to unclear audio, background noise, or network connectivity issues. The analysis will focus on visual elements with timestamps."
                 
                 # Step 3: AI Analysis and PDF Generation (skip for transcription-only)
                 pdf_path = None
+                pdf_bytes = None
                 analysis_text = None
                 enhanced_pdf_path = None
                 
@@ -160,6 +259,7 @@ if uploaded_file is not None:
                 elif os.getenv("ANTHROPIC_API_KEY"):
                     status_text.text("🧠 Applying $142M marketing framework...")
                     progress_bar.progress(85)
+                    progress_bar.flush()
                     
                     try:
                         analysis_text, enhanced_pdf_path = ad_analyzer.process_complete_analysis(frames_data, transcript_data, uploaded_file.name)
@@ -179,72 +279,55 @@ if uploaded_file is not None:
                         
                         # Fallback to basic PDF if AI analysis fails
                         status_text.text("📄 Creating basic visual breakdown...")
+                        pdf_path = None
                         try:
-                            pdf_path = pdf_generator.create_pdf(frames_data, transcript_data, uploaded_file.name)
+                            pdf_bytes = pdf_generator.create_pdf(frames_data, transcript_data, uploaded_file.name, as_bytes=True)
                         except Exception as pdf_error:
                             st.error(f"PDF creation failed: {str(pdf_error)}")
-                            pdf_path = None
                         analysis_text = None
                         enhanced_pdf_path = None
                 else:
                     # No AI analysis available, create basic PDF
                     status_text.text("📄 Creating visual breakdown...")
                     progress_bar.progress(85)
+                    progress_bar.flush()
                     try:
-                        pdf_path = pdf_generator.create_pdf(frames_data, transcript_data, uploaded_file.name)
+                        pdf_bytes = pdf_generator.create_pdf(frames_data, transcript_data, uploaded_file.name, as_bytes=True)
                     except Exception as pdf_error:
                         st.error(f"PDF creation failed: {str(pdf_error)}")
-                        pdf_path = None
                 
                 # Step 4: Complete
                 progress_bar.progress(100)
                 status_text.text("🎉 Intelligence extraction complete!")
                 
+                # Read the enhanced PDF once so reruns serve the download from memory
+                if pdf_path and os.path.exists(pdf_path):
+                    with open(pdf_path, "rb") as pdf_file:
+                        pdf_bytes = pdf_file.read()
+                
                 # Store processed data
                 st.session_state.processed_data = {
-                    'pdf_path': pdf_path,
-                    'enhanced_pdf_path': enhanced_pdf_path,
+                    'pdf_bytes': pdf_bytes,
                     'analysis_text': analysis_text,
                     'frames_count': len(frames_data),
                     'transcript_length': len(transcript_data) if transcript_data else 0,
                     'video_filename': uploaded_file.name,
-                    'has_ai_analysis': enhanced_pdf_path is not None and pdf_path == enhanced_pdf_path,
+                    'has_ai_analysis': bool(enhanced_pdf_path and enhanced_pdf_path == pdf_path),
                     'transcribe_only': transcribe_only,
                     'transcript_data': transcript_data if transcribe_only else None
                 }
                 
-                # Clean up temporary video file
-                os.unlink(video_path)
-                
             except Exception as e:
                 st.error(f"An error occurred during processing: {str(e)}")
-                # Clean up temporary files
-                if video_path and os.path.exists(video_path):
-                    try:
-                        os.unlink(video_path)
-                    except:
-                        pass
             
             finally:
-                # Comprehensive cleanup to reduce memory usage
+                # Remove the uploaded copy, compressed output and extracted assets
                 try:
-                    if 'video_path' in locals() and video_path and os.path.exists(video_path):
-                        os.unlink(video_path)
-                except:
+                    cleanup.close()
+                except OSError:
                     pass
                 
-                try:
-                    if 'temp_video_path' in locals() and temp_video_path and temp_video_path != locals().get('video_path') and os.path.exists(temp_video_path):
-                        os.unlink(temp_video_path)
-                except:
-                    pass
-                
-                # Force garbage collection to free memory
-                import gc
-                gc.collect()
-                
                 st.session_state.processing = False
-                time.sleep(1)  # Brief pause to show completion
                 st.rerun()
 
 # Display results and download section
@@ -290,17 +373,14 @@ if st.session_state.processed_data:
         # Generate safe filename
         video_filename = st.session_state.processed_data.get('video_filename', 'video')
         video_name = os.path.splitext(video_filename)[0]
-        safe_name = "".join(c for c in video_name if c.isalnum() or c in (' ', '-', '_')).rstrip()
+        safe_name = _SAFE_RE.sub('', video_name).rstrip()
         
         # Main PDF Download
-        pdf_path = st.session_state.processed_data.get('pdf_path')
         has_ai_analysis = st.session_state.processed_data.get('has_ai_analysis', False)
         analysis_text = st.session_state.processed_data.get('analysis_text')
     
-        if pdf_path and os.path.exists(pdf_path):
-            with open(pdf_path, "rb") as pdf_file:
-                pdf_bytes = pdf_file.read()
-            
+        pdf_bytes = st.session_state.processed_data.get('pdf_bytes')
+        if pdf_bytes:
             # Display appropriate title based on content
             if has_ai_analysis:
                 st.subheader("🧠 Complete Marketing Intelligence Report")
@@ -1,109 +1,138 @@
 import os
+import re
 import tempfile
 from datetime import datetime
-from reportlab.lib.pagesizes import letter, A4
+from reportlab.lib.pagesizes import A4
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle, StyleSheet1
 from reportlab.lib.units import inch
 from reportlab.lib import colors
-from reportlab.platypus.tableofcontents import TableOfContents
-from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_JUSTIFY
-import textwrap
+from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY
 from utils import format_time
 from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from reportlab import rl_config
+
+# Attribute validation on every flowable is only useful while debugging layouts
+if not os.environ.get('PDFGEN_DEBUG'):
+    rl_config.shapeChecking = 0
+
+# Built once at import; instances get their own copy of the lookup tables
+_BASE_STYLES = getSampleStyleSheet()
+
+# Frame images are drawn at most 5 x 3.5 inches; embed them at 150 DPI
+FRAME_MAX_WIDTH = 5*inch
+FRAME_MAX_HEIGHT = 3.5*inch
+FRAME_DPI = 150
+# Frames up to this factor over the target resolution are embedded without
+# re-encoding (ffmpeg's 800px frames land here); larger ones are downscaled
+FRAME_RESIZE_SLACK = 1.25
+
+# Sentence boundary: whitespace following terminal punctuation
+_SENT_SPLIT = re.compile(r'(?<=[.!?])\s+')
+
+# A transcript word: any run of non-whitespace
+_WORD_RE = re.compile(r'\S+')
 
 class PDFGenerator:
+    # Paragraph styles are pure configuration, so they are built once and shared
+    
+    # Title style
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=_BASE_STYLES['Heading1'],
+        fontSize=24,
+        spaceAfter=30,
+        alignment=TA_CENTER,
+        textColor=colors.darkblue,
+        fontName='Helvetica-Bold'
+    )
+    
+    # Subtitle style
+    subtitle_style = ParagraphStyle(
+        'CustomSubtitle',
+        parent=_BASE_STYLES['Heading2'],
+        fontSize=16,
+        spaceAfter=20,
+        alignment=TA_CENTER,
+        textColor=colors.darkgrey
+    )
+    
+    # Timestamp style
+    timestamp_style = ParagraphStyle(
+        'TimestampStyle',
+        parent=_BASE_STYLES['Normal'],
+        fontSize=12,
+        spaceAfter=10,
+        textColor=colors.blue,
+        fontName='Helvetica-Bold'
+    )
+    
+    # Transcript style
+    transcript_style = ParagraphStyle(
+        'TranscriptStyle',
+        parent=_BASE_STYLES['Normal'],
+        fontSize=11,
+        spaceAfter=20,
+        alignment=TA_JUSTIFY,
+        leftIndent=20,
+        rightIndent=20,
+        spaceBefore=10
+    )
+    
+    # Frame caption style
+    caption_style = ParagraphStyle(
+        'CaptionStyle',
+        parent=_BASE_STYLES['Normal'],
+        fontSize=10,
+        spaceAfter=15,
+        alignment=TA_CENTER,
+        textColor=colors.darkgrey,
+        fontName='Helvetica-Oblique'
+    )
+    
+    # Full transcript style
+    full_transcript_style = ParagraphStyle(
+        'FullTranscriptStyle',
+        parent=_BASE_STYLES['Normal'],
+        fontSize=10,
+        spaceAfter=8,
+        alignment=TA_JUSTIFY,
+        leftIndent=15,
+        rightIndent=15,
+        spaceBefore=6
+    )
+    
     def __init__(self):
         """Initialize PDF generator with styles."""
-        self.styles = getSampleStyleSheet()
-        self._setup_custom_styles()
-    
-    def _setup_custom_styles(self):
-        """Setup custom paragraph styles."""
-        # Title style
-        self.title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=self.styles['Heading1'],
-            fontSize=24,
-            spaceAfter=30,
-            alignment=TA_CENTER,
-            textColor=colors.darkblue,
-            fontName='Helvetica-Bold'
-        )
-        
-        # Subtitle style
-        self.subtitle_style = ParagraphStyle(
-            'CustomSubtitle',
-            parent=self.styles['Heading2'],
-            fontSize=16,
-            spaceAfter=20,
-            alignment=TA_CENTER,
-            textColor=colors.darkgrey
-        )
-        
-        # Timestamp style
-        self.timestamp_style = ParagraphStyle(
-            'TimestampStyle',
-            parent=self.styles['Normal'],
-            fontSize=12,
-            spaceAfter=10,
-            textColor=colors.blue,
-            fontName='Helvetica-Bold'
-        )
-        
-        # Transcript style
-        self.transcript_style = ParagraphStyle(
-            'TranscriptStyle',
-            parent=self.styles['Normal'],
-            fontSize=11,
-            spaceAfter=20,
-            alignment=TA_JUSTIFY,
-            leftIndent=20,
-            rightIndent=20,
-            spaceBefore=10
-        )
-        
-        # Frame caption style
-        self.caption_style = ParagraphStyle(
-            'CaptionStyle',
-            parent=self.styles['Normal'],
-            fontSize=10,
-            spaceAfter=15,
-            alignment=TA_CENTER,
-            textColor=colors.darkgrey,
-            fontName='Helvetica-Oblique'
-        )
-        
-        # Full transcript style
-        self.full_transcript_style = ParagraphStyle(
-            'FullTranscriptStyle',
-            parent=self.styles['Normal'],
-            fontSize=10,
-            spaceAfter=8,
-            alignment=TA_JUSTIFY,
-            leftIndent=15,
-            rightIndent=15,
-            spaceBefore=6
-        )
+        # Own name tables over the shared styles, so styles a caller adds do
+        # not leak into other instances
+        self.styles = StyleSheet1()
+        self.styles.byName = dict(_BASE_STYLES.byName)
+        self.styles.byAlias = dict(_BASE_STYLES.byAlias)
+        # Reused across PDFs; worker threads are only started on first use
+        self._image_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1)
     
-    def create_pdf(self, frames_data, transcript_text, video_filename):
+    def create_pdf(self, frames_data, transcript_text, video_filename, as_bytes=False):
         """
         Create PDF with frames and transcript.
         
+        The document is built in memory and written out with a single write.
+        
         Args:
             frames_data (list): List of frame dictionaries
             transcript_text (str): Full transcript text
             video_filename (str): Original video filename
+            as_bytes (bool): Return the PDF bytes instead of writing a file
         
         Returns:
-            str: Path to the generated PDF file
+            str or bytes: Path to the generated PDF file, or its bytes if `as_bytes`
         """
-        # Create temporary PDF file
-        pdf_path = tempfile.mktemp(suffix='.pdf')
+        buffer = BytesIO()
         
         # Create PDF document
         doc = SimpleDocTemplate(
-            pdf_path,
+            buffer,
             pagesize=A4,
             rightMargin=72,
             leftMargin=72,
@@ -113,29 +142,40 @@ class PDFGenerator:
         
         # Build PDF content
         story = []
+        append = story.append
         
         # Add title page
-        story.extend(self._create_title_page(video_filename, len(frames_data)))
+        self._append_title_page(append, video_filename, len(frames_data))
+        
+        # Format the whole transcript once for every section that shows it in full
+        formatted_paragraphs = self._format_transcript_text(transcript_text) if transcript_text else []
         
         # Add frames and transcript sections
-        story.extend(self._create_content_pages(frames_data, transcript_text))
+        self._append_content_pages(append, frames_data, transcript_text, formatted_paragraphs)
         
         # Add full transcript section at the end
-        story.extend(self._create_full_transcript_section(transcript_text))
+        self._append_full_transcript_section(append, formatted_paragraphs)
         
         # Build PDF 
         doc.build(story)
+        pdf_bytes = buffer.getvalue()
+        
+        if as_bytes:
+            return pdf_bytes
+        
+        # Create the temporary PDF file atomically and write through its descriptor
+        fd, pdf_path = tempfile.mkstemp(suffix='.pdf')
+        with os.fdopen(fd, 'wb') as pdf_file:
+            pdf_file.write(pdf_bytes)
         
         return pdf_path
     
-    def _create_title_page(self, video_filename, frame_count):
-        """Create the title page of the PDF."""
-        story = []
-        
+    def _append_title_page(self, append, video_filename, frame_count):
+        """Append the title page of the PDF."""
         # Main title
         title = Paragraph("📹 Video Summary Report", self.title_style)
-        story.append(title)
-        story.append(Spacer(1, 0.5*inch))
+        append(title)
+        append(Spacer(1, 0.5*inch))
         
         # Video information
         video_info = f"""
@@ -146,8 +186,8 @@ class PDFGenerator:
         """
         
         info_para = Paragraph(video_info, self.subtitle_style)
-        story.append(info_para)
-        story.append(Spacer(1, 1*inch))
+        append(info_para)
+        append(Spacer(1, 1*inch))
         
         # Description
         description = """
@@ -159,28 +199,20 @@ class PDFGenerator:
         """
         
         desc_para = Paragraph(description, self.styles['Normal'])
-        story.append(desc_para)
-        story.append(PageBreak())
-        
-        return story
+        append(desc_para)
+        append(PageBreak())
     
-    def _create_content_pages(self, frames_data, transcript_text):
-        """Create content pages with frames and transcript."""
-        story = []
-        
+    def _append_content_pages(self, append, frames_data, transcript_text, formatted_paragraphs):
+        """Append content pages with frames and transcript."""
         # If we have frames, create frame-based pages
         if frames_data:
-            story.extend(self._create_frame_pages(frames_data, transcript_text))
+            self._append_frame_pages(append, frames_data, transcript_text)
         else:
             # If no frames, just add transcript
-            story.extend(self._create_transcript_only_pages(transcript_text))
-        
-        return story
+            self._append_transcript_only_pages(append, formatted_paragraphs)
     
-    def _create_frame_pages(self, frames_data, transcript_text):
-        """Create pages with frames and corresponding transcript sections."""
-        story = []
-        
+    def _append_frame_pages(self, append, frames_data, transcript_text):
+        """Append pages with frames and corresponding transcript sections."""
         # Calculate transcript segments for each frame
         if transcript_text and len(frames_data) > 1:
             # Estimate transcript segments based on timestamps
@@ -189,65 +221,42 @@ class PDFGenerator:
             # If only one frame or no transcript, use full text
             transcript_segments = [transcript_text] * len(frames_data)
         
+        # Resize all frames up front; Pillow releases the GIL while decoding and
+        # encoding, so this runs in parallel. The story itself stays serial.
+        prepared_images = [self._image_pool.submit(self._prepare_frame_image, frame_data) for frame_data in frames_data]
+        
         for i, frame_data in enumerate(frames_data):
             # Add frame title
             timestamp = frame_data['timestamp']
             frame_title = f"Frame at {format_time(timestamp)}"
             title_para = Paragraph(frame_title, self.timestamp_style)
-            story.append(title_para)
-            story.append(Spacer(1, 0.2*inch))
+            append(title_para)
+            append(Spacer(1, 0.2*inch))
             
             # Add frame image
             try:
-                # Use BytesIO to create image directly from memory
-                image_stream = BytesIO(frame_data['image_data'])
-                
-                # Create PIL Image to get actual dimensions
-                from PIL import Image as PILImage
-                pil_img = PILImage.open(image_stream)
-                original_width, original_height = pil_img.size
-                pil_img.close()
-                
-                # Reset stream position
-                image_stream.seek(0)
-                
-                # Calculate proper aspect ratio
-                aspect_ratio = original_width / original_height
-                
-                # Set maximum dimensions
-                max_width = 5*inch
-                max_height = 3.5*inch
-                
-                # Calculate dimensions maintaining aspect ratio
-                if aspect_ratio > (max_width / max_height):
-                    # Image is wider - constrain by width
-                    img_width = max_width
-                    img_height = max_width / aspect_ratio
-                else:
-                    # Image is taller - constrain by height
-                    img_height = max_height
-                    img_width = max_height * aspect_ratio
+                img_width, img_height, image_buffer = prepared_images[i].result()
                 
                 # Add image to PDF with calculated dimensions
-                img = Image(image_stream, width=img_width, height=img_height)
-                story.append(img)
+                img = Image(image_buffer, width=img_width, height=img_height)
+                append(img)
                 
                 # Add image caption
                 caption = f"Video frame at {format_time(timestamp)}"
                 caption_para = Paragraph(caption, self.caption_style)
-                story.append(caption_para)
-                story.append(Spacer(1, 0.3*inch))
+                append(caption_para)
+                append(Spacer(1, 0.3*inch))
                 
             except Exception as e:
                 error_text = f"Error displaying frame: {str(e)}"
                 error_para = Paragraph(error_text, self.styles['Normal'])
-                story.append(error_para)
-                story.append(Spacer(1, 0.2*inch))
+                append(error_para)
+                append(Spacer(1, 0.2*inch))
             
             # Add corresponding transcript segment
             if i < len(transcript_segments) and transcript_segments[i]:
                 transcript_title = Paragraph("📝 Transcript", self.styles['Heading3'])
-                story.append(transcript_title)
+                append(transcript_title)
                 
                 # Wrap and format transcript text
                 segment_text = transcript_segments[i].strip()
@@ -256,36 +265,71 @@ class PDFGenerator:
                     paragraphs = self._format_transcript_text(segment_text)
                     for para_text in paragraphs:
                         para = Paragraph(para_text, self.transcript_style)
-                        story.append(para)
+                        append(para)
                 else:
                     no_audio_para = Paragraph("No audio detected for this time segment.", self.transcript_style)
-                    story.append(no_audio_para)
+                    append(no_audio_para)
             
             # Add page break (except for the last frame)
             if i < len(frames_data) - 1:
-                story.append(PageBreak())
-        
-        return story
+                append(PageBreak())
     
-    def _create_transcript_only_pages(self, transcript_text):
-        """Create pages with only transcript when no frames are available."""
-        story = []
+    def _prepare_frame_image(self, frame_data):
+        """
+        Downscale a frame to the resolution it is drawn at in the PDF.
+        
+        Frames already close to that resolution are passed through unchanged.
+        
+        Args:
+            frame_data (dict): Frame dictionary with JPEG `image_data`
+        
+        Returns:
+            tuple: (draw width, draw height, BytesIO of the JPEG to embed)
+        """
+        # Pillow is only needed once a PDF with frames is actually built
+        from PIL import Image as PILImage
+        
+        with PILImage.open(BytesIO(frame_data['image_data'])) as pil_img:
+            target_size = (int(FRAME_MAX_WIDTH * FRAME_DPI / 72), int(FRAME_MAX_HEIGHT * FRAME_DPI / 72))
+            pixel_width, pixel_height = pil_img.size
+            
+            # open() only parses the header, so small JPEGs are embedded as-is
+            # without ever decoding their pixels
+            if (pil_img.format == 'JPEG' and pil_img.mode in ('RGB', 'L')
+                    and pixel_width <= target_size[0] * FRAME_RESIZE_SLACK
+                    and pixel_height <= target_size[1] * FRAME_RESIZE_SLACK):
+                out = BytesIO(frame_data['image_data'])
+            else:
+                # Let libjpeg decode at a reduced DCT scale (1/2, 1/4, 1/8) where it
+                # can; the remaining small resize does not need LANCZOS
+                pil_img.draft('RGB', target_size)
+                
+                # thumbnail() keeps the aspect ratio within the pixel bounds
+                pil_img.thumbnail(target_size, PILImage.BILINEAR)
+                pixel_width, pixel_height = pil_img.size
+                
+                out = BytesIO()
+                pil_img.convert('RGB').save(out, 'JPEG', quality=82, optimize=True)
+                out.seek(0)
         
+        # Scale to fit the frame box in points
+        scale = min(FRAME_MAX_WIDTH / pixel_width, FRAME_MAX_HEIGHT / pixel_height)
+        return pixel_width * scale, pixel_height * scale, out
+    
+    def _append_transcript_only_pages(self, append, formatted_paragraphs):
+        """Append pages with only transcript when no frames are available."""
         # Add transcript title
         title = Paragraph("📝 Complete Transcript", self.styles['Heading2'])
-        story.append(title)
-        story.append(Spacer(1, 0.3*inch))
+        append(title)
+        append(Spacer(1, 0.3*inch))
         
-        if transcript_text:
-            paragraphs = self._format_transcript_text(transcript_text)
-            for para_text in paragraphs:
+        if formatted_paragraphs:
+            for para_text in formatted_paragraphs:
                 para = Paragraph(para_text, self.transcript_style)
-                story.append(para)
+                append(para)
         else:
             no_transcript_para = Paragraph("No transcript available.", self.transcript_style)
-            story.append(no_transcript_para)
-        
-        return story
+            append(no_transcript_para)
     
     def _segment_transcript(self, transcript_text, frames_data):
         """
@@ -303,21 +347,25 @@ class PDFGenerator:
         
         # Simple segmentation - divide transcript equally among frames
         # In a more sophisticated version, you could use timestamp data from Whisper
-        words = transcript_text.split()
-        words_per_segment = max(1, len(words) // len(frames_data))
+        # Word offsets let each segment be sliced straight out of the transcript
+        word_spans = [match.span() for match in _WORD_RE.finditer(transcript_text)]
+        word_count = len(word_spans)
+        words_per_segment = max(1, word_count // len(frames_data))
         
         segments = []
         for i in range(len(frames_data)):
             start_idx = i * words_per_segment
-            end_idx = start_idx + words_per_segment
             
             # For the last segment, include all remaining words
             if i == len(frames_data) - 1:
-                segment_words = words[start_idx:]
+                end_idx = word_count
             else:
-                segment_words = words[start_idx:end_idx]
+                end_idx = min(start_idx + words_per_segment, word_count)
             
-            segments.append(' '.join(segment_words))
+            if start_idx >= end_idx:
+                segments.append('')
+            else:
+                segments.append(transcript_text[word_spans[start_idx][0]:word_spans[end_idx - 1][1]])
         
         return segments
     
@@ -335,7 +383,7 @@ class PDFGenerator:
             return [""]
         
         # Split into sentences
-        sentences = text.replace('. ', '.|').replace('? ', '?|').replace('! ', '!|').split('|')
+        sentences = _SENT_SPLIT.split(text)
         
         paragraphs = []
         current_paragraph = []
@@ -346,7 +394,7 @@ class PDFGenerator:
             if not sentence:
                 continue
             
-            words_in_sentence = len(sentence.split())
+            words_in_sentence = sentence.count(' ') + 1
             
             # Start new paragraph if current one is getting too long
             if words_in_paragraph > 100 and current_paragraph:
@@ -363,30 +411,25 @@ class PDFGenerator:
         
         return paragraphs if paragraphs else [text]
     
-    def _create_full_transcript_section(self, transcript_text):
-        """Create a section with the complete transcript."""
-        story = []
-        
+    def _append_full_transcript_section(self, append, formatted_paragraphs):
+        """Append a section with the complete transcript."""
         # Add page break
-        story.append(PageBreak())
+        append(PageBreak())
         
         # Add section title
         title = Paragraph("📋 Complete Transcript", self.title_style)
-        story.append(title)
-        story.append(Spacer(1, 0.3*inch))
+        append(title)
+        append(Spacer(1, 0.3*inch))
         
         # Add full transcript
-        if transcript_text:
-            formatted_paragraphs = self._format_transcript_text(transcript_text)
+        if formatted_paragraphs:
             for para_text in formatted_paragraphs:
                 if para_text.strip():
                     para = Paragraph(para_text, self.full_transcript_style)
-                    story.append(para)
-                    story.append(Spacer(1, 0.1*inch))
+                    append(para)
+                    append(Spacer(1, 0.1*inch))
         else:
             no_transcript = Paragraph("No transcript available", self.full_transcript_style)
-            story.append(no_transcript)
-        
-        return story
+            append(no_transcript)
     
 
@@ -0,0 +1,59 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+try:
+    from video_processor import VideoProcessor, MIN_TAIL_SECONDS
+except ImportError:  # openai is not installed
+    VideoProcessor = None
+
+
+@unittest.skipIf(VideoProcessor is None, "video_processor dependencies are not installed")
+class SilenceSplitPointsTest(unittest.TestCase):
+    def setUp(self):
+        # _silence_split_points needs no client, so skip __init__
+        self.processor = VideoProcessor.__new__(VideoProcessor)
+
+    def test_duration_just_over_a_chunk_multiple_leaves_no_sliver(self):
+        self.assertEqual(self.processor._silence_split_points([], 30, 60.05), [30])
+
+    def test_pause_snapping_leaves_no_sliver(self):
+        self.assertEqual(self.processor._silence_split_points([20.5], 30, 50.52), [20.5])
+
+    def test_every_chunk_is_long_enough(self):
+        for duration in (31, 60.05, 90.02, 121.5):
+            points = self.processor._silence_split_points([], 30, duration)
+            if points:
+                self.assertGreaterEqual(duration - points[-1], MIN_TAIL_SECONDS)
+
+
+@unittest.skipIf(VideoProcessor is None, "video_processor dependencies are not installed")
+@unittest.skipIf(shutil.which("ffmpeg") is None, "ffmpeg is not installed")
+class SparseFramesTest(unittest.TestCase):
+    def setUp(self):
+        self.processor = VideoProcessor.__new__(VideoProcessor)
+        self.tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp_dir)
+
+    def make_clip(self, seconds):
+        path = os.path.join(self.tmp_dir, f"clip_{seconds}.mp4")
+        subprocess.run(
+            ['ffmpeg', '-f', 'lavfi', '-i', f'testsrc=duration={seconds}:size=320x240:rate=25',
+             '-pix_fmt', 'yuv420p', '-y', path],
+            capture_output=True, check=True
+        )
+        return path
+
+    def test_sparse_and_dense_paths_sample_the_same_frames(self):
+        for seconds in (4, 5):
+            clip = self.make_clip(seconds)
+            dense = self.processor.extract_frames(clip, fps=0.5)
+            sparse = self.processor.extract_frames(clip, fps=0.5, sparse=True)
+            self.assertEqual(len(sparse), len(dense))
+            self.assertEqual([f['timestamp'] for f in sparse], [f['timestamp'] for f in dense])
+
+
+if __name__ == "__main__":
+    unittest.main()
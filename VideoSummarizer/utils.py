@@ -1,6 +1,13 @@
 import os
-import mimetypes
+import re
+import json
+import logging
+import time
+import subprocess
 from datetime import timedelta
+from functools import lru_cache
+
+logger = logging.getLogger(__name__)
 
 def format_time(seconds):
     """
@@ -15,12 +22,21 @@ def format_time(seconds):
     if seconds < 0:
         return "00:00:00"
     
-    hours = int(seconds // 3600)
-    minutes = int((seconds % 3600) // 60)
-    secs = int(seconds % 60)
+    # Frame timestamps repeat the same few whole seconds, so cache per second
+    return _format_whole_seconds(int(seconds))
+
+@lru_cache(maxsize=4096)
+def _format_whole_seconds(seconds):
+    """Format a non-negative whole number of seconds as HH:MM:SS."""
+    hours = seconds // 3600
+    minutes = (seconds % 3600) // 60
+    secs = seconds % 60
     
     return f"{hours:02d}:{minutes:02d}:{secs:02d}"
 
+# Video container extensions accepted for processing
+_VALID_EXTENSIONS = frozenset({'.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv'})
+
 def validate_video_file(file_path):
     """
     Validate if the file is a valid video file.
@@ -31,26 +47,56 @@ def validate_video_file(file_path):
     Returns:
         tuple: (is_valid, error_message)
     """
-    if not os.path.exists(file_path):
+    # One stat covers both the existence and the size check
+    try:
+        file_stat = os.stat(file_path)
+    except FileNotFoundError:
         return False, "File does not exist"
     
-    if os.path.getsize(file_path) == 0:
+    if file_stat.st_size == 0:
         return False, "File is empty"
     
-    # Check MIME type
-    mime_type, _ = mimetypes.guess_type(file_path)
-    if not mime_type or not mime_type.startswith('video/'):
-        return False, "File is not a video format"
-    
     # Check file extension
-    valid_extensions = ['.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv']
     file_extension = os.path.splitext(file_path)[1].lower()
     
-    if file_extension not in valid_extensions:
+    if file_extension not in _VALID_EXTENSIONS:
         return False, f"Unsupported file extension: {file_extension}"
     
     return True, "Valid video file"
 
+# Top-level ISO BMFF / QuickTime atoms that may open an MP4 or MOV file
+_LEADING_ATOMS = {b'ftyp', b'moov', b'mdat', b'wide', b'free', b'skip', b'pnot'}
+
+def validate_video_header(file_obj, header_size=8192):
+    """
+    Validate an MP4/MOV file from its header without reading the whole file.
+    
+    Args:
+        file_obj: Seekable binary file object, rewound before returning
+        header_size (int): Number of bytes to inspect (default: 8192)
+    
+    Returns:
+        tuple: (is_valid, major brand such as 'isom' or 'qt', or an error message)
+    """
+    file_obj.seek(0)
+    try:
+        header = file_obj.read(header_size)
+    finally:
+        file_obj.seek(0)
+    
+    if len(header) < 8:
+        return False, "File is empty or truncated"
+    
+    atom_type = header[4:8]
+    if atom_type not in _LEADING_ATOMS:
+        return False, "File is not an MP4 or MOV video"
+    
+    if atom_type == b'ftyp' and len(header) >= 12:
+        return True, header[8:12].decode('latin-1').strip()
+    
+    # Legacy QuickTime files may start without an ftyp atom
+    return True, "qt"
+
 def get_file_size_mb(file_path):
     """
     Get file size in megabytes.
@@ -67,6 +113,217 @@ def get_file_size_mb(file_path):
     size_bytes = os.path.getsize(file_path)
     return size_bytes / (1024 * 1024)
 
+def log_ffmpeg_stderr(log, stderr):
+    """
+    Log ffmpeg's stderr at DEBUG level only.
+    
+    It can run to megabytes, so it is never decoded unless DEBUG is enabled.
+    
+    Args:
+        log (logging.Logger): Logger of the calling module
+        stderr (bytes or str): Captured ffmpeg stderr
+    """
+    if stderr and log.isEnabledFor(logging.DEBUG):
+        if isinstance(stderr, bytes):
+            stderr = stderr.decode('utf-8', errors='replace')
+        log.debug("ffmpeg stderr:\n%s", stderr)
+
+# Buffer size for ffmpeg pipes read through Popen file objects
+PIPE_BUFSIZE = 1 << 20
+
+# ffprobe limits and fields: 1 MB / 1 s still finds streams in headerless
+# containers such as FLV, where 32 KB / 0 s could miss the audio stream
+PROBE_SIZE = '1M'
+PROBE_ANALYZE_US = '1000000'
+PROBE_ENTRIES = (
+    'format=duration,bit_rate:'
+    'stream=codec_type,codec_name,duration,bit_rate,width,height,r_frame_rate'
+)
+
+def probe_video(video_path):
+    """
+    Read container and stream metadata with a single ffprobe call.
+    
+    Results are memoized per file version (path, mtime, size) and shared by
+    every caller in the process, so duration, codec, bitrate and audio checks
+    on the same file cost one subprocess. Treat the result as read-only.
+    
+    Args:
+        video_path (str): Path to the video file
+    
+    Returns:
+        dict: ffprobe JSON with 'format' and 'streams' limited to PROBE_ENTRIES
+            (empty on failure)
+    """
+    try:
+        file_stat = os.stat(video_path)
+        return _probe_file_version(os.path.abspath(video_path), file_stat.st_mtime_ns, file_stat.st_size)
+    except Exception as e:
+        logger.warning("Error probing video: %s", e)
+        return {}
+
+@lru_cache(maxsize=64)
+def _probe_file_version(video_path, mtime_ns, size):
+    """Run ffprobe for one file version; raises so failures are not cached."""
+    # Container headers carry everything read here, so probe far less than
+    # ffprobe's 5 MB / 5 s default; only the fields callers use are printed
+    cmd = [
+        'ffprobe', '-v', 'quiet', '-probesize', PROBE_SIZE, '-analyzeduration', PROBE_ANALYZE_US,
+        '-print_format', 'json', '-show_entries', PROBE_ENTRIES, video_path
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffprobe exited with code {result.returncode}")
+    return json.loads(result.stdout)
+
+def first_stream(probe_data, codec_type):
+    """Return the first stream of `codec_type` ('video', 'audio') from probe data, or None."""
+    return next((stream for stream in probe_data.get('streams', []) if stream.get('codec_type') == codec_type), None)
+
+# Filename pattern ffmpeg uses for sampled frames
+FRAME_PATTERN = "frame_%04d.jpg"
+FRAME_MAX_WIDTH = 800
+
+def _frame_filter_args(fps=None):
+    """
+    ffmpeg arguments that sample (if `fps` is set), downscale and JPEG-encode
+    frames from the first video stream only.
+    """
+    filters = [f'fps={fps}'] if fps else []
+    filters.append(f"scale='min({FRAME_MAX_WIDTH},iw)':-2")
+    return ['-map', '0:v:0', '-an', '-sn', '-dn', '-vf', ','.join(filters), '-q:v', '5']
+
+def frame_output_args(frames_dir, fps):
+    """
+    Build ffmpeg output arguments that write sampled JPEG frames.
+    
+    Frames are downscaled to at most 800px wide (keeping aspect ratio) and
+    encoded at roughly JPEG quality 85, ready for the PDF without Pillow.
+    
+    Args:
+        frames_dir (str): Directory to write frames into
+        fps (float): Frames per second to sample
+    
+    Returns:
+        list: ffmpeg arguments for one frame output
+    """
+    return [*_frame_filter_args(fps), os.path.join(frames_dir, FRAME_PATTERN)]
+
+def frame_pipe_args(fps=None):
+    """
+    Build ffmpeg output arguments that stream sampled JPEG frames to stdout.
+    
+    Args:
+        fps (float, optional): Frames per second to sample; every decoded
+            frame is kept if omitted
+    
+    Returns:
+        list: ffmpeg arguments for a concatenated MJPEG stream on pipe:1
+    """
+    return [*_frame_filter_args(fps), '-f', 'image2pipe', '-vcodec', 'mjpeg', 'pipe:1']
+
+def iter_jpeg_stream(stream, read_size=1 << 16):
+    """
+    Yield single JPEG images from a concatenated stream (as written by image2pipe).
+    
+    Images are yielded as soon as they are complete, so the reader can work
+    while the writer is still producing.
+    
+    Args:
+        stream: Binary file object, e.g. a Popen stdout pipe
+        read_size (int): Most bytes per read (default: 64 KB)
+    
+    Yields:
+        bytes: One JPEG image, in stream order
+    """
+    # read1() returns whatever the pipe has instead of waiting for a full
+    # read_size, so a finished image is not held back by the next one
+    read = getattr(stream, 'read1', stream.read)
+    buffer = bytearray()
+    scan_from = 2
+    for chunk in iter(lambda: read(read_size), b''):
+        buffer += chunk
+        while True:
+            # An image ends at EOI; the next one starts at the following SOI
+            end = buffer.find(b'\xff\xd9\xff\xd8', scan_from)
+            if end == -1:
+                # Resume just before the tail, in case a marker straddles reads
+                scan_from = max(2, len(buffer) - 3)
+                break
+            yield bytes(buffer[:end + 2])
+            del buffer[:end + 2]
+            scan_from = 2
+    if buffer.startswith(b'\xff\xd8'):
+        yield bytes(buffer)
+
+AUDIO_SUFFIX = ".ogg"
+
+def _audio_codec_args():
+    """ffmpeg arguments that encode the first audio stream as 16 kHz mono Opus speech."""
+    return [
+        '-map', '0:a:0', '-vn', '-sn', '-dn', '-c:a', 'libopus', '-b:a', '12k', '-application', 'voip',
+        '-ac', '1', '-ar', '16000'
+    ]
+
+def audio_output_args(audio_path):
+    """
+    Build ffmpeg output arguments that write 16 kHz mono Opus audio for Whisper.
+    
+    Opus at 12 kbps in VoIP mode keeps speech intelligible for Whisper at
+    well under half the upload size of the equivalent MP3.
+    
+    Args:
+        audio_path (str): Path of the audio file to write (an .ogg file)
+    
+    Returns:
+        list: ffmpeg arguments for one audio output
+    """
+    return [*_audio_codec_args(), audio_path]
+
+def audio_pipe_args():
+    """
+    Build ffmpeg output arguments that stream Whisper-ready OGG/Opus audio to stdout.
+    
+    Returns:
+        list: ffmpeg arguments for an OGG stream on pipe:1
+    """
+    return [*_audio_codec_args(), '-f', 'ogg', 'pipe:1']
+
+class ThrottledProgress:
+    """
+    Wrap a progress bar so updates are sent at most `hz` times per second.
+    
+    The newest dropped value is kept and sent with the next allowed update or
+    by `flush()`. The final 100% update is always sent.
+    """
+    
+    def __init__(self, bar, hz=10):
+        self.bar = bar
+        self.interval = 1.0 / hz
+        self.last = 0.0
+        self.pending = None
+    
+    def progress(self, value):
+        """Forward `value` to the wrapped bar unless an update was just sent."""
+        now = time.monotonic()
+        if now - self.last >= self.interval or value >= 100:
+            self.bar.progress(value)
+            self.last = now
+            self.pending = None
+        else:
+            self.pending = value
+    
+    def flush(self):
+        """Send the newest dropped value, e.g. before a long-running step."""
+        if self.pending is not None:
+            self.bar.progress(self.pending)
+            self.last = time.monotonic()
+            self.pending = None
+
+# Whitespace runs, and the control characters str.split() does not treat as whitespace
+_WHITESPACE_RE = re.compile(r'\s+')
+_CONTROL_CHARS_RE = re.compile(r'[\x00-\x08\x0e-\x1b]')
+
 def clean_text(text):
     """
     Clean and normalize text content.
@@ -81,10 +338,10 @@ def clean_text(text):
         return ""
     
     # Remove extra whitespace and normalize line endings
-    text = ' '.join(text.split())
+    text = _WHITESPACE_RE.sub(' ', text)
     
     # Remove any control characters
-    cleaned = ''.join(char for char in text if ord(char) >= 32 or char in '\n\t')
+    cleaned = _CONTROL_CHARS_RE.sub('', text)
     
     return cleaned.strip()
 
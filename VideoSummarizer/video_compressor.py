@@ -1,21 +1,52 @@
 import os
+import re
+import logging
 import tempfile
 import subprocess
-from utils import get_file_size_mb
+from collections import deque
+from utils import get_file_size_mb, frame_output_args, audio_output_args, probe_video, first_stream, PIPE_BUFSIZE, log_ffmpeg_stderr
+
+logger = logging.getLogger(__name__)
+
+# Hardware H.264 encoders, in order of preference
+HW_ENCODERS = ['h264_videotoolbox', 'h264_nvenc', 'h264_qsv', 'h264_vaapi']
+VAAPI_DEVICE = '/dev/dri/renderD128'
+# ffmpeg stderr is drained in 64 KB reads; the last 8 are kept for error reports
+STDERR_READ_SIZE = 1 << 16
 
 class VideoCompressor:
-    def __init__(self):
-        """Initialize video compressor."""
-        pass
+    def __init__(self, crf=28, preset='veryfast'):
+        """
+        Initialize video compressor.
+        
+        Args:
+            crf (int): Constant quality level for the first encode (default: 28)
+            preset (str): libx264 speed preset (default: 'veryfast')
+        """
+        self.crf = crf
+        self.preset = preset
+        self.video_codec = self._detect_video_codec()
     
-    def compress_video(self, input_path, target_size_mb=45, max_duration_seconds=300):
+    def compress_video(self, input_path, target_size_mb=45, max_duration_seconds=300,
+                       frames_dir=None, fps=0.5, audio_path=None):
         """
         Compress video to target size while maintaining quality.
         
+        Only the first `max_duration_seconds` of the input are decoded and encoded,
+        so analysis is bounded to that window.
+        
+        Frames and audio for analysis can be produced by the same ffmpeg run, so
+        the video is only decoded once. They are only complete when the video is
+        actually re-encoded. If `input_path` is returned, a failed encode may have
+        left partial outputs, so callers must ignore them and extract their own.
+        
         Args:
             input_path (str): Path to input video
             target_size_mb (int): Target file size in MB (default: 45MB)
             max_duration_seconds (int): Maximum duration to process (default: 5 minutes)
+            frames_dir (str, optional): Directory to write sampled JPEG frames into
+            fps (float): Frame sampling rate for `frames_dir` (default: 0.5)
+            audio_path (str, optional): Path to write Whisper-ready audio to
         
         Returns:
             str: Path to compressed video file
@@ -31,10 +62,9 @@ class VideoCompressor:
             # Get video duration
             duration = self._get_video_duration(input_path)
             
-            # If video is too long, trim it
+            # If video is too long, trim it as part of the encode
             if duration > max_duration_seconds:
-                print(f"Video duration ({duration}s) exceeds maximum ({max_duration_seconds}s). Trimming...")
-                input_path = self._trim_video(input_path, max_duration_seconds)
+                logger.info("Video duration (%ss) exceeds maximum (%ss). Trimming...", duration, max_duration_seconds)
                 duration = max_duration_seconds
             
             # Calculate target bitrate
@@ -44,125 +74,282 @@ class VideoCompressor:
             min_bitrate = 200  # kbps
             target_bitrate_kbps = max(target_bitrate_kbps, min_bitrate)
             
+            # Extra outputs decoded alongside the compressed video
+            extra_outputs = []
+            if frames_dir:
+                extra_outputs += frame_output_args(frames_dir, fps)
+            if audio_path and self._has_audio_stream(input_path):
+                extra_outputs += audio_output_args(audio_path)
+            
             # Create compressed video
-            compressed_path = self._compress_with_ffmpeg(input_path, target_bitrate_kbps)
+            compressed_path = self._compress_with_ffmpeg(
+                input_path, target_size_mb, target_bitrate_kbps, extra_outputs, max_duration_seconds
+            )
             
             compressed_size_mb = get_file_size_mb(compressed_path)
-            print(f"Compression complete: {original_size_mb:.1f}MB → {compressed_size_mb:.1f}MB")
+            logger.info("Compression complete: %.1fMB → %.1fMB", original_size_mb, compressed_size_mb)
             
             return compressed_path
             
         except Exception as e:
-            print(f"Error compressing video: {e}")
+            logger.warning("Error compressing video: %s", e)
             return input_path  # Return original if compression fails
     
+    def needs_compression(self, video_path, max_bitrate_kbps=8000):
+        """
+        Check whether re-encoding the video would pay off.
+        
+        Args:
+            video_path (str): Path to the video file
+            max_bitrate_kbps (int): Highest H.264 bitrate kept as-is (default: 8000)
+        
+        Returns:
+            bool: False if the video is already H.264 at a reasonable bitrate
+        """
+        try:
+            data = probe_video(video_path)
+            video_stream = first_stream(data, 'video')
+            if not video_stream or video_stream.get('codec_name') != 'h264':
+                return True
+            
+            # Stream bitrate is missing for some containers; use the overall one
+            bit_rate = video_stream.get('bit_rate') or data.get('format', {}).get('bit_rate')
+            if not bit_rate:
+                return True
+            return int(bit_rate) / 1000 > max_bitrate_kbps
+        except Exception as e:
+            logger.warning("Error probing video codec: %s", e)
+            return True
+    
+    def trim_video(self, input_path, max_duration_seconds=300):
+        """
+        Losslessly trim video to a maximum duration without re-encoding.
+        
+        Args:
+            input_path (str): Path to input video
+            max_duration_seconds (int): Maximum duration to keep (default: 5 minutes)
+        
+        Returns:
+            str: Path to trimmed video, or the input if it is already short enough
+        """
+        if self._get_video_duration(input_path) <= max_duration_seconds:
+            return input_path
+        return self._trim_video(input_path, max_duration_seconds)
+    
+    def duration(self, video_path):
+        """Get video duration in seconds (0 if unknown)."""
+        try:
+            return float(probe_video(video_path).get('format', {}).get('duration', 0))
+        except (TypeError, ValueError):
+            return 0
+    
+    def fps(self, video_path):
+        """Get the frame rate of the first video stream (0 if unknown)."""
+        video_stream = first_stream(probe_video(video_path), 'video')
+        if not video_stream:
+            return 0
+        try:
+            num, den = map(float, video_stream.get('r_frame_rate', '0/1').split('/'))
+            return num / den if den else 0
+        except ValueError:
+            return 0
+    
+    def dimensions(self, video_path):
+        """Get (width, height) of the first video stream ((0, 0) if unknown)."""
+        video_stream = first_stream(probe_video(video_path), 'video')
+        if not video_stream:
+            return 0, 0
+        return int(video_stream.get('width', 0)), int(video_stream.get('height', 0))
+    
     def _get_video_duration(self, video_path):
         """Get video duration in seconds."""
+        return self.duration(video_path)
+    
+    def _run_ffmpeg(self, cmd):
+        """
+        Run an ffmpeg command, keeping only the tail of its stderr.
+        
+        Args:
+            cmd (list): ffmpeg command line
+        
+        Returns:
+            tuple: (return code, last ~512 KB of stderr as text)
+        """
+        proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, bufsize=PIPE_BUFSIZE)
+        tail = deque(maxlen=8)
+        for chunk in iter(lambda: proc.stderr.read(STDERR_READ_SIZE), b''):
+            tail.append(chunk)
+        proc.stderr.close()
+        returncode = proc.wait()
+        return returncode, b''.join(tail).decode('utf-8', errors='replace')
+    
+    def _detect_video_codec(self):
+        """Pick the best available hardware H.264 encoder, or libx264."""
         try:
-            cmd = [
-                'ffprobe', '-v', 'quiet', '-print_format', 'json',
-                '-show_format', video_path
-            ]
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            if result.returncode == 0:
-                import json
-                data = json.loads(result.stdout)
-                return float(data['format']['duration'])
-            return 0
+            result = subprocess.run(['ffmpeg', '-hide_banner', '-encoders'], capture_output=True, text=True)
+            available = set(re.findall(r'^\s*V\S*\s+(\S+)', result.stdout, re.MULTILINE))
         except Exception as e:
-            print(f"Error getting video duration: {e}")
-            return 0
+            logger.warning("Error listing ffmpeg encoders: %s", e)
+            return 'libx264'
+        
+        for encoder in HW_ENCODERS:
+            if encoder in available and (encoder != 'h264_vaapi' or os.path.exists(VAAPI_DEVICE)):
+                return encoder
+        return 'libx264'
+    
+    def _video_args(self, target_bitrate_kbps=None):
+        """
+        ffmpeg video encoder arguments for the selected codec.
+        
+        Args:
+            target_bitrate_kbps (int, optional): Encode at this bitrate instead of
+                at constant quality
+        
+        Returns:
+            list: ffmpeg arguments for the video output
+        """
+        codec = self.video_codec
+        args = ['-c:v', codec]
+        if codec == 'h264_vaapi':
+            args += ['-vf', 'format=nv12,hwupload']
+        
+        if target_bitrate_kbps:
+            if codec == 'libx264':
+                args += ['-preset', self.preset]
+            return args + ['-b:v', f'{target_bitrate_kbps}k']
+        
+        if codec == 'h264_videotoolbox':
+            # VideoToolbox quality runs 1-100, higher is better
+            args += ['-q:v', str(max(1, min(100, 100 - 2 * self.crf)))]
+        elif codec == 'h264_nvenc':
+            args += ['-rc', 'vbr', '-cq', str(self.crf), '-b:v', '0']
+        elif codec == 'h264_qsv':
+            args += ['-global_quality', str(self.crf)]
+        elif codec == 'h264_vaapi':
+            args += ['-qp', str(self.crf)]
+        else:
+            args += ['-preset', self.preset, '-crf', str(self.crf)]
+        return args
+    
+    def _fall_back_to_software(self):
+        """Switch to libx264 after a hardware encoder failed; returns True if switched."""
+        if self.video_codec == 'libx264':
+            return False
+        logger.warning("Hardware encoder %s failed, falling back to libx264", self.video_codec)
+        self.video_codec = 'libx264'
+        return True
+    
+    def _input_args(self, input_path, max_duration=None):
+        """ffmpeg input arguments, limiting the read to `max_duration` seconds."""
+        args = []
+        if self.video_codec == 'h264_vaapi':
+            args += ['-vaapi_device', VAAPI_DEVICE]
+        if max_duration:
+            args += ['-t', str(max_duration)]
+        return args + ['-i', input_path]
+    
+    def _has_audio_stream(self, video_path):
+        """Check whether the video contains an audio stream."""
+        return first_stream(probe_video(video_path), 'audio') is not None
     
     def _trim_video(self, input_path, max_duration):
-        """Trim video to maximum duration."""
+        """Trim video to maximum duration with a keyframe-aligned stream copy."""
         try:
             file_extension = os.path.splitext(input_path)[1]
             with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as tmp_file:
                 trimmed_path = tmp_file.name
             
+            # -ss before -i seeks on the input keyframe index instead of decoding
             cmd = [
-                'ffmpeg', '-i', input_path, '-t', str(max_duration),
-                '-c', 'copy', '-y', trimmed_path
+                'ffmpeg', '-ss', '0', '-i', input_path, '-t', str(max_duration),
+                '-map', '0:v', '-map', '0:a?', '-c', 'copy',
+                '-avoid_negative_ts', 'make_zero', '-y', trimmed_path
             ]
-            result = subprocess.run(cmd, capture_output=True, text=True)
+            returncode, stderr_tail = self._run_ffmpeg(cmd)
             
-            if result.returncode == 0:
+            if returncode == 0:
                 return trimmed_path
             else:
-                print(f"Error trimming video: {result.stderr}")
+                logger.warning("Error trimming video: ffmpeg exited with code %s", returncode)
+                log_ffmpeg_stderr(logger, stderr_tail)
                 return input_path
                 
         except Exception as e:
-            print(f"Error trimming video: {e}")
+            logger.warning("Error trimming video: %s", e)
             return input_path
     
-    def _compress_with_ffmpeg(self, input_path, target_bitrate_kbps):
-        """Compress video using ffmpeg with specified bitrate."""
+    def _compress_with_ffmpeg(self, input_path, target_size_mb, target_bitrate_kbps,
+                              extra_outputs=(), max_duration=None):
+        """Compress video using a single-pass CRF encode.
+        
+        Falls back to a bitrate-targeted encode if the result still exceeds
+        `target_size_mb`. `extra_outputs` are additional ffmpeg output arguments
+        written alongside the video, sharing its decode. `max_duration` limits
+        how many seconds of input are read.
+        """
         try:
+            input_args = self._input_args(input_path, max_duration)
             file_extension = os.path.splitext(input_path)[1]
             with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as tmp_file:
                 compressed_path = tmp_file.name
             
-            # Use two-pass encoding for better quality
-            cmd_pass1 = [
-                'ffmpeg', '-i', input_path,
-                '-c:v', 'libx264', '-b:v', f'{target_bitrate_kbps}k',
-                '-pass', '1', '-c:a', 'aac', '-b:a', '64k',
-                '-f', 'null', '-y', '/dev/null'
-            ]
-            
-            cmd_pass2 = [
-                'ffmpeg', '-i', input_path,
-                '-c:v', 'libx264', '-b:v', f'{target_bitrate_kbps}k',
-                '-pass', '2', '-c:a', 'aac', '-b:a', '64k',
-                '-movflags', '+faststart', '-y', compressed_path
+            cmd = [
+                'ffmpeg', *input_args,
+                *self._video_args(),
+                '-c:a', 'aac', '-b:a', '64k',
+                '-movflags', '+faststart', '-y', compressed_path,
+                *extra_outputs
             ]
             
-            # First pass
-            result1 = subprocess.run(cmd_pass1, capture_output=True, text=True)
-            if result1.returncode != 0:
-                print(f"First pass failed: {result1.stderr}")
-                # Fall back to single-pass encoding
-                return self._compress_single_pass(input_path, target_bitrate_kbps)
-            
-            # Second pass
-            result2 = subprocess.run(cmd_pass2, capture_output=True, text=True)
-            if result2.returncode != 0:
-                print(f"Second pass failed: {result2.stderr}")
-                return self._compress_single_pass(input_path, target_bitrate_kbps)
+            returncode, stderr_tail = self._run_ffmpeg(cmd)
+            if returncode != 0:
+                logger.warning("CRF compression failed with exit code %s", returncode)
+                log_ffmpeg_stderr(logger, stderr_tail)
+                os.remove(compressed_path)
+                if self._fall_back_to_software():
+                    return self._compress_with_ffmpeg(
+                        input_path, target_size_mb, target_bitrate_kbps, extra_outputs, max_duration
+                    )
+                return self._compress_single_pass(input_path, target_bitrate_kbps, extra_outputs, max_duration)
             
-            # Clean up pass files
-            for pass_file in ['ffmpeg2pass-0.log', 'ffmpeg2pass-0.log.mbtree']:
-                if os.path.exists(pass_file):
-                    os.remove(pass_file)
+            if get_file_size_mb(compressed_path) > target_size_mb:
+                # Frames and audio were already written by the CRF pass
+                logger.info("CRF output exceeds %sMB, re-encoding at %skbps", target_size_mb, target_bitrate_kbps)
+                os.remove(compressed_path)
+                return self._compress_single_pass(input_path, target_bitrate_kbps, (), max_duration)
             
             return compressed_path
             
         except Exception as e:
-            print(f"Error in two-pass compression: {e}")
-            return self._compress_single_pass(input_path, target_bitrate_kbps)
+            logger.warning("Error in CRF compression: %s", e)
+            return self._compress_single_pass(input_path, target_bitrate_kbps, extra_outputs, max_duration)
     
-    def _compress_single_pass(self, input_path, target_bitrate_kbps):
-        """Single-pass compression as fallback."""
+    def _compress_single_pass(self, input_path, target_bitrate_kbps, extra_outputs=(), max_duration=None):
+        """Single-pass bitrate-targeted compression as fallback."""
         try:
+            input_args = self._input_args(input_path, max_duration)
             file_extension = os.path.splitext(input_path)[1]
             with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as tmp_file:
                 compressed_path = tmp_file.name
             
             cmd = [
-                'ffmpeg', '-i', input_path,
-                '-c:v', 'libx264', '-b:v', f'{target_bitrate_kbps}k',
+                'ffmpeg', *input_args,
+                *self._video_args(target_bitrate_kbps),
                 '-c:a', 'aac', '-b:a', '64k',
-                '-movflags', '+faststart', '-y', compressed_path
+                '-movflags', '+faststart', '-y', compressed_path,
+                *extra_outputs
             ]
             
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            if result.returncode == 0:
+            returncode, stderr_tail = self._run_ffmpeg(cmd)
+            if returncode == 0:
                 return compressed_path
             else:
-                print(f"Single-pass compression failed: {result.stderr}")
+                logger.warning("Single-pass compression failed with exit code %s", returncode)
+                log_ffmpeg_stderr(logger, stderr_tail)
+                if self._fall_back_to_software():
+                    return self._compress_single_pass(input_path, target_bitrate_kbps, extra_outputs, max_duration)
                 return input_path
                 
         except Exception as e:
-            print(f"Error in single-pass compression: {e}")
+            logger.warning("Error in single-pass compression: %s", e)
             return input_path
\ No newline at end of file
@@ -1,10 +1,34 @@
 import os
+import re
+import math
+import asyncio
+import logging
 import tempfile
 import subprocess
-import json
-from PIL import Image
-from pydub import AudioSegment
+from collections import deque
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
 from openai import OpenAI
+from utils import FRAME_PATTERN, frame_pipe_args, iter_jpeg_stream, audio_pipe_args, probe_video, first_stream, AUDIO_SUFFIX, PIPE_BUFSIZE, log_ffmpeg_stderr
+
+logger = logging.getLogger(__name__)
+
+# silencedetect settings for choosing audio chunk boundaries
+SILENCE_NOISE_DB = -30
+SILENCE_MIN_SECONDS = 0.3
+# No chunk cut is placed closer than this to the end of the audio; Whisper
+# rejects clips shorter than 0.1 s, which would fail the whole transcript
+MIN_TAIL_SECONDS = 2
+# Audio quieter than this on average is treated as containing no speech
+SILENT_MEAN_VOLUME_DB = -50
+
+class TranscriptionFailed(Exception):
+    """Raised when audio could not be transcribed."""
+    pass
+
+class AudioUnclear(TranscriptionFailed):
+    """Raised when the video has no audio or no detectable speech."""
+    pass
 
 class VideoProcessor:
     def __init__(self):
@@ -13,145 +37,462 @@ class VideoProcessor:
         self.openai_client = OpenAI(
             api_key=os.getenv("OPENAI_API_KEY", "")
         )
+        # Optional local faster-whisper pipeline, loaded on first use
+        self._local_whisper = None
     
-    def extract_frames(self, video_path, fps=1.0):
+    def extract_frames(self, video_path, fps=1.0, frames_dir=None, sparse=False):
         """
         Extract frames from video at specified FPS.
         
         Args:
             video_path (str): Path to the video file
             fps (float): Frames per second to extract (default: 1.0)
+            frames_dir (str, optional): Directory already holding frames sampled at
+                `fps` (e.g. by VideoCompressor); ffmpeg is only run if it is empty
+            sparse (bool): Seek to each sample time instead of decoding the whole
+                video; faster when samples are far apart relative to the
+                keyframe interval (default: False)
         
         Returns:
             list: List of dictionaries containing frame data
         """
-        frames_data = []
-        
         try:
-            # Create temporary directory for frames
-            with tempfile.TemporaryDirectory() as temp_dir:
-                # Get video duration first
-                duration = self._get_video_duration(video_path)
-                if duration <= 0:
-                    return []
-                
-                # Extract frames using ffmpeg
-                frame_pattern = os.path.join(temp_dir, "frame_%04d.jpg")
-                
-                cmd = [
-                    'ffmpeg', '-i', video_path, '-vf', f'fps={fps}',
-                    '-y', frame_pattern
-                ]
-                result = subprocess.run(cmd, capture_output=True, text=True)
-                if result.returncode != 0:
-                    print(f"FFmpeg frame extraction failed: {result.stderr}")
-                    return []
-                
-                # Process extracted frames
-                frame_files = sorted([f for f in os.listdir(temp_dir) if f.startswith('frame_')])
-                
-                for i, frame_file in enumerate(frame_files):
-                    frame_path = os.path.join(temp_dir, frame_file)
-                    timestamp = i / fps  # Calculate timestamp based on FPS
-                    
-                    # Load and process image
-                    try:
-                        with Image.open(frame_path) as img:
-                            # Resize image if too large (max width: 800px)
-                            if img.width > 800:
-                                ratio = 800 / img.width
-                                new_height = int(img.height * ratio)
-                                img = img.resize((800, new_height), Image.Resampling.LANCZOS)
-                            
-                            # Save processed image to temporary location
-                            processed_frame_path = os.path.join(temp_dir, f"processed_{frame_file}")
-                            img.save(processed_frame_path, 'JPEG', quality=85)
-                            
-                            # Read image data
-                            with open(processed_frame_path, 'rb') as f:
-                                image_data = f.read()
-                            
-                            frames_data.append({
-                                'timestamp': timestamp,
-                                'image_data': image_data,
-                                'filename': f"frame_{i+1:04d}.jpg"
-                            })
-                    
-                    except Exception as e:
-                        print(f"Error processing frame {frame_file}: {e}")
-                        continue
-        
+            return list(self.iter_frames(video_path, fps, frames_dir, sparse))
         except Exception as e:
-            print(f"Error extracting frames: {e}")
+            logger.warning("Error extracting frames: %s", e)
             return []
+    
+    def iter_frames(self, video_path, fps=1.0, frames_dir=None, sparse=False):
+        """
+        Yield frames one at a time as they are extracted.
+        
+        Same arguments as `extract_frames`. The pipe and frames-directory paths
+        hold only the frame being handed out; sparse seeking also keeps a small
+        window of frames decoded ahead. Consumers can start work while ffmpeg
+        is still decoding.
+        
+        Yields:
+            dict: Frame data with 'timestamp', 'image_data' and 'filename'
+        
+        Raises:
+            RuntimeError: If ffmpeg frame extraction failed
+        """
+        if frames_dir and os.path.exists(os.path.join(frames_dir, FRAME_PATTERN % 1)):
+            frame_images = self._read_frame_files(frames_dir)
+        else:
+            # Get video duration first
+            duration = self._get_video_duration(video_path)
+            if duration <= 0:
+                return
+            
+            if sparse:
+                frame_images = self._seek_frames(video_path, duration, fps)
+            else:
+                frame_images = self._pipe_frames(video_path, fps)
+        
+        for i, image_data in enumerate(frame_images):
+            # Sample times that could not be decoded are skipped, keeping
+            # the remaining timestamps aligned
+            if not image_data:
+                continue
+            yield {
+                'timestamp': i / fps,  # Calculate timestamp based on FPS
+                'image_data': image_data,
+                'filename': f"frame_{i+1:04d}.jpg"
+            }
+    
+    def _read_frame_files(self, frames_dir):
+        """
+        Yield the numbered frame files ffmpeg wrote into `frames_dir`.
+        
+        Files are walked by number rather than listed, so position == frame
+        number - 1 and timestamps follow the filenames. Unreadable frames
+        yield b''.
+        """
+        frame_number = 1
+        frame_path = os.path.join(frames_dir, FRAME_PATTERN % frame_number)
+        while os.path.exists(frame_path):
+            try:
+                with open(frame_path, 'rb') as f:
+                    yield f.read()
+            except Exception as e:
+                logger.warning("Error processing frame %s: %s", frame_path, e)
+                yield b''
+            frame_number += 1
+            frame_path = os.path.join(frames_dir, FRAME_PATTERN % frame_number)
+    
+    def _pipe_frames(self, video_path, fps):
+        """
+        Yield JPEG frames from ffmpeg's stdout as they are encoded.
+        
+        Non-reference frames are not decoded: with sparse sampling the fps
+        filter discards them anyway. -threads 0 lets the decoder use every core.
+        
+        Raises:
+            RuntimeError: If ffmpeg exits with an error
+        """
+        cmd = [
+            'ffmpeg', '-threads', '0', '-skip_frame', 'nonref', '-i', video_path,
+            *frame_pipe_args(fps)
+        ]
+        # stderr goes to a file so a chatty ffmpeg cannot block on a full pipe
+        # while stdout is being consumed
+        with tempfile.TemporaryFile() as stderr_file:
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr_file, bufsize=PIPE_BUFSIZE)
+            try:
+                yield from iter_jpeg_stream(proc.stdout)
+            except BaseException:
+                # Consumer stopped early (GeneratorExit) or failed; stop ffmpeg
+                proc.kill()
+                raise
+            finally:
+                proc.stdout.close()
+                returncode = proc.wait()
+            
+            if returncode != 0:
+                logger.warning("FFmpeg frame extraction failed with exit code %s", returncode)
+                if logger.isEnabledFor(logging.DEBUG):
+                    stderr_file.seek(0)
+                    log_ffmpeg_stderr(logger, stderr_file.read())
+                raise RuntimeError("FFmpeg frame extraction failed")
+    
+    def _seek_frames(self, video_path, duration, fps):
+        """
+        Grab one frame per sample time with input seeking.
+        
+        `-ss` before `-i` jumps via the keyframe index, so only the frames
+        around each sample are decoded. Seeks run in parallel, one ffmpeg
+        process each. Frames are yielded in sample order, and only a bounded
+        window of seeks runs ahead of the consumer.
+        
+        Args:
+            video_path (str): Path to the video file
+            duration (float): Video duration in seconds
+            fps (float): Samples per second
+        
+        Yields:
+            bytes: JPEG bytes per sample time (b'' where no frame was decoded)
+        """
+        def grab(timestamp):
+            cmd = [
+                'ffmpeg', '-threads', '1', '-ss', f'{timestamp:.3f}', '-i', video_path,
+                '-frames:v', '1', *frame_pipe_args()
+            ]
+            result = subprocess.run(cmd, capture_output=True)
+            if result.returncode != 0:
+                logger.warning("FFmpeg frame seek at %.3fs failed", timestamp)
+                log_ffmpeg_stderr(logger, result.stderr)
+                return b''
+            return result.stdout
+        
+        # Same samples as the fps filter: t = 0, 1/fps, ... while t < duration
+        sample_count = math.ceil(duration * fps)
+        timestamps = [t for t in (i / fps for i in range(sample_count)) if t < duration]
+        workers = os.cpu_count() or 1
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            for timestamp in timestamps:
+                pending.append(executor.submit(grab, timestamp))
+                if len(pending) > 2 * workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+    
+    async def process_video_async(self, video_path, fps=1.0, frames_dir=None, audio_path=None):
+        """
+        Extract frames and transcribe audio concurrently.
+        
+        Both jobs spend their time in ffmpeg subprocesses and network calls, so
+        running the sync methods on worker threads overlaps them.
+        
+        Args:
+            video_path (str): Path to the video file
+            fps (float): Frames per second to extract (default: 1.0)
+            frames_dir (str, optional): Pre-extracted frames, as for `extract_frames`
+            audio_path (str, optional): Pre-extracted audio, as for `transcribe_audio`
+        
+        Returns:
+            tuple: (frames data list, transcript text)
         
-        return frames_data
+        Raises:
+            TranscriptionFailed: If transcription failed (see `transcribe_audio`)
+        """
+        return tuple(await asyncio.gather(
+            asyncio.to_thread(self.extract_frames, video_path, fps, frames_dir),
+            asyncio.to_thread(self.transcribe_audio, video_path, audio_path)
+        ))
     
-    def transcribe_audio(self, video_path):
+    def transcribe_audio(self, video_path, audio_path=None, chunk_seconds=30, max_concurrency=5):
         """
         Transcribe audio from video using OpenAI Whisper API.
         
+        The audio is split into chunks of about `chunk_seconds`, cut at pauses,
+        which are transcribed concurrently and joined back in order.
+        Setting USE_LOCAL_WHISPER transcribes with a local faster-whisper model
+        instead, falling back to the API if it is unavailable.
+        
         Args:
             video_path (str): Path to the video file
+            audio_path (str, optional): Audio already extracted from the video
+                (e.g. by VideoCompressor); otherwise ffmpeg extracts it into memory
+            chunk_seconds (int): Length of each transcription chunk (default: 30)
+            max_concurrency (int): Maximum concurrent Whisper requests (default: 5)
         
         Returns:
             str: Transcribed text
+        
+        Raises:
+            AudioUnclear: If there is no audio or no speech was detected
+            TranscriptionFailed: If audio extraction or the Whisper API failed
         """
-        audio_path = None
         try:
-            # Extract audio from video
-            with tempfile.NamedTemporaryFile(suffix='.mp3', delete=False) as audio_file:
-                audio_path = audio_file.name
+            if audio_path and os.path.exists(audio_path) and os.path.getsize(audio_path) > 0:
+                audio_source = audio_path
+                duration = float(probe_video(audio_path).get('format', {}).get('duration', 0))
+            else:
+                # Extract audio from video straight into memory
+                audio_source = self._extract_audio_bytes(video_path)
+                duration = self._get_video_duration(video_path)
             
-            # Use ffmpeg to extract audio
-            cmd = [
-                'ffmpeg', '-i', video_path, '-acodec', 'mp3', 
-                '-ac', '1', '-ar', '16000', '-y', audio_path
-            ]
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            if result.returncode != 0:
-                print(f"FFmpeg audio extraction failed: {result.stderr}")
-                return "Failed to extract audio from video."
+            # Check if audio was extracted and has content
+            if not audio_source:
+                raise AudioUnclear("No audio content found in the video.")
             
-            # Check if audio file was created and has content
-            if not os.path.exists(audio_path) or os.path.getsize(audio_path) == 0:
-                return "No audio content found in the video."
+            # One local pass measures loudness and finds pauses for chunking;
+            # silent videos never reach Whisper
+            mean_volume, pauses = self._analyze_audio(audio_source)
+            if mean_volume is not None and mean_volume < SILENT_MEAN_VOLUME_DB:
+                raise AudioUnclear("No speech detected in the audio.")
+            
+            if os.getenv('USE_LOCAL_WHISPER'):
+                try:
+                    transcript = self._transcribe_locally(audio_source)
+                    if not transcript:
+                        raise AudioUnclear("No speech detected in the audio.")
+                    return transcript
+                except AudioUnclear:
+                    raise
+                except Exception as local_error:
+                    logger.warning("Local Whisper failed, falling back to OpenAI: %s", local_error)
             
             # Try OpenAI Whisper API
             try:
-                with open(audio_path, 'rb') as audio_file:
-                    transcript = self.openai_client.audio.transcriptions.create(
-                        model="whisper-1",
-                        file=audio_file,
-                        response_format="text"
-                    )
-                
-                if audio_path and os.path.exists(audio_path):
-                    os.unlink(audio_path)
-                
-                return transcript if transcript else "No speech detected in the audio."
+                if 0 < duration <= chunk_seconds:
+                    # Fits in one request; no need to split
+                    parts = [self._transcribe_chunk(audio_source)]
+                else:
+                    with tempfile.TemporaryDirectory() as chunk_dir:
+                        chunks = self._split_audio(audio_source, chunk_dir, chunk_seconds, duration, pauses)
+                        with ThreadPoolExecutor(max_workers=min(max_concurrency, len(chunks))) as executor:
+                            parts = list(executor.map(self._transcribe_chunk, chunks))
             
             except Exception as openai_error:
-                print(f"OpenAI Whisper failed: {openai_error}")
+                logger.warning("OpenAI Whisper failed: %s", openai_error)
                 error_msg = str(openai_error)
                 if "insufficient_quota" in error_msg or "429" in error_msg:
-                    return "OpenAI API quota exceeded. Please check your billing or try again later."
+                    raise TranscriptionFailed("OpenAI API quota exceeded. Please check your billing or try again later.")
                 elif "401" in error_msg or "unauthorized" in error_msg.lower():
-                    return "OpenAI API key is invalid. Please check your API key configuration."
+                    raise TranscriptionFailed("OpenAI API key is invalid. Please check your API key configuration.")
                 else:
-                    return f"Transcription failed: {error_msg}"
+                    raise TranscriptionFailed(f"Transcription failed: {error_msg}")
+            
+            transcript = ' '.join(part.strip() for part in parts if part and part.strip())
+            if not transcript:
+                raise AudioUnclear("No speech detected in the audio.")
+            return transcript
+        
+        except TranscriptionFailed:
+            raise
         
         except Exception as e:
-            print(f"Error in transcription process: {e}")
-            return f"Transcription failed: {str(e)}"
+            logger.exception("Error in transcription process")
+            raise TranscriptionFailed(f"Transcription failed: {str(e)}")
+    
+    def _transcribe_locally(self, audio_source):
+        """
+        Transcribe with a local faster-whisper model using batched inference.
         
-        finally:
-            # Clean up temporary files
-            if audio_path and os.path.exists(audio_path):
-                try:
-                    os.unlink(audio_path)
-                except:
-                    pass
+        Enabled by setting USE_LOCAL_WHISPER; LOCAL_WHISPER_MODEL picks the model
+        size (default: 'base'). Runs INT8 on CPU, or FP16 when a CUDA device is
+        available.
+        
+        Args:
+            audio_source (str or bytes): Path to the audio file, or the audio itself
+        
+        Returns:
+            str: Transcribed text
+        """
+        if self._local_whisper is None:
+            # Optional dependency; ImportError makes the caller fall back to OpenAI
+            import ctranslate2
+            from faster_whisper import WhisperModel, BatchedInferencePipeline
+            
+            if ctranslate2.get_cuda_device_count() > 0:
+                model = WhisperModel(os.getenv('LOCAL_WHISPER_MODEL', 'base'), device='cuda', compute_type='float16')
+            else:
+                model = WhisperModel(os.getenv('LOCAL_WHISPER_MODEL', 'base'), device='cpu', compute_type='int8')
+            self._local_whisper = BatchedInferencePipeline(model=model)
+        
+        audio_input = BytesIO(audio_source) if isinstance(audio_source, bytes) else audio_source
+        segments, _ = self._local_whisper.transcribe(audio_input, batch_size=16)
+        return ' '.join(segment.text.strip() for segment in segments if segment.text.strip())
+    
+    def _extract_audio_bytes(self, video_path):
+        """
+        Extract Whisper-ready audio from the video over an ffmpeg stdout pipe.
+        
+        Args:
+            video_path (str): Path to the video file
+        
+        Returns:
+            bytes: OGG/Opus audio (empty if the video has no audio)
+        
+        Raises:
+            TranscriptionFailed: If ffmpeg failed
+        """
+        cmd = [
+            'ffmpeg', '-threads', '0', '-i', video_path,
+            *audio_pipe_args()
+        ]
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        audio_data, stderr = proc.communicate()
+        if proc.returncode != 0:
+            stderr_text = stderr.decode('utf-8', errors='replace')
+            if 'does not contain any stream' in stderr_text or 'matches no streams' in stderr_text:
+                return b''
+            logger.warning("FFmpeg audio extraction failed with exit code %s", proc.returncode)
+            log_ffmpeg_stderr(logger, stderr_text)
+            raise TranscriptionFailed("Failed to extract audio from video.")
+        return audio_data
+    
+    def _audio_input(self, audio_source):
+        """ffmpeg input arguments and stdin payload for a path or in-memory audio."""
+        if isinstance(audio_source, bytes):
+            return ['-f', 'ogg', '-i', 'pipe:0'], audio_source
+        return ['-i', audio_source], None
+    
+    def _analyze_audio(self, audio_source):
+        """
+        Measure loudness and find pauses in one ffmpeg pass.
+        
+        Args:
+            audio_source (str or bytes): Path to the audio file, or the audio itself
+        
+        Returns:
+            tuple: (mean volume in dB or None if unknown, pause midpoints in seconds)
+        """
+        try:
+            input_args, stdin_data = self._audio_input(audio_source)
+            cmd = [
+                'ffmpeg', *input_args, '-af',
+                f'silencedetect=noise={SILENCE_NOISE_DB}dB:d={SILENCE_MIN_SECONDS},volumedetect',
+                '-f', 'null', '-'
+            ]
+            result = subprocess.run(cmd, input=stdin_data, capture_output=True)
+            if result.returncode != 0:
+                return None, []
+            stderr_text = result.stderr.decode('utf-8', errors='replace')
+        except Exception as e:
+            logger.warning("Error analyzing audio: %s", e)
+            return None, []
+        
+        mean_match = re.search(r'mean_volume: (-?[\d.]+|-inf) dB', stderr_text)
+        mean_volume = float(mean_match.group(1)) if mean_match else None
+        starts = [float(t) for t in re.findall(r'silence_start: (-?[\d.]+)', stderr_text)]
+        ends = [float(t) for t in re.findall(r'silence_end: ([\d.]+)', stderr_text)]
+        pauses = [(start + end) / 2 for start, end in zip(starts, ends)]
+        return mean_volume, pauses
+    
+    def _split_audio(self, audio_source, chunk_dir, chunk_seconds, duration, pauses):
+        """
+        Split audio into roughly `chunk_seconds` long chunks without re-encoding.
+        
+        Cuts are moved into nearby pauses where possible, so words are not
+        split between two Whisper requests.
+        
+        Args:
+            audio_source (str or bytes): Path to the audio file, or the audio itself
+            chunk_dir (str): Directory to write chunks into
+            chunk_seconds (int): Target length of each chunk in seconds
+            duration (float): Audio duration in seconds (0 if unknown)
+            pauses (list): Pause midpoints in seconds (see `_analyze_audio`)
+        
+        Returns:
+            list: Chunk paths in playback order (the original audio if splitting fails)
+        """
+        split_points = self._silence_split_points(pauses, chunk_seconds, duration)
+        if split_points:
+            segment_args = ['-segment_times', ','.join(f'{t:.3f}' for t in split_points)]
+        elif duration > 0:
+            # Only a short tail past one chunk; send it in one request
+            return [audio_source]
+        else:
+            segment_args = ['-segment_time', str(chunk_seconds)]
+        
+        input_args, stdin_data = self._audio_input(audio_source)
+        cmd = [
+            'ffmpeg', *input_args, '-f', 'segment',
+            *segment_args, '-reset_timestamps', '1',
+            '-c', 'copy', '-y', os.path.join(chunk_dir, 'chunk_%03d' + AUDIO_SUFFIX)
+        ]
+        result = subprocess.run(cmd, input=stdin_data, capture_output=True)
+        chunk_files = sorted(f for f in os.listdir(chunk_dir) if f.startswith('chunk_'))
+        if result.returncode != 0 or not chunk_files:
+            logger.warning("FFmpeg audio split failed, transcribing in one request")
+            log_ffmpeg_stderr(logger, result.stderr)
+            return [audio_source]
+        chunk_paths = [os.path.join(chunk_dir, f) for f in chunk_files]
+        if not split_points and len(chunk_paths) > 1:
+            # Fixed-length cuts with an unknown duration can leave a sliver at the end
+            last = probe_video(chunk_paths[-1]).get('format', {}).get('duration')
+            if last is not None and float(last) < 0.1:
+                chunk_paths.pop()
+        return chunk_paths
+    
+    def _silence_split_points(self, pauses, chunk_seconds, duration):
+        """
+        Choose chunk boundaries at pauses close to every `chunk_seconds`.
+        
+        Args:
+            pauses (list): Pause midpoints in seconds
+            chunk_seconds (int): Target length of each chunk in seconds
+            duration (float): Audio duration in seconds (0 if unknown)
+        
+        Returns:
+            list: Split times in seconds, each at least `MIN_TAIL_SECONDS` before
+                the end (empty if no split is needed or the duration is unknown)
+        """
+        if duration <= chunk_seconds:
+            return []
+        
+        # Snap each cut to the closest pause within a third of a chunk
+        split_points = []
+        window = chunk_seconds / 3
+        target = chunk_seconds
+        while target < duration - MIN_TAIL_SECONDS:
+            nearby = [t for t in pauses if abs(t - target) <= window]
+            cut = min(nearby, key=lambda t: abs(t - target)) if nearby else target
+            if cut >= duration - MIN_TAIL_SECONDS:
+                # A pause too close to the end; leave the tail in this chunk
+                break
+            split_points.append(cut)
+            target = cut + chunk_seconds
+        return split_points
+    
+    def _transcribe_chunk(self, chunk):
+        """Transcribe a single audio file (a path, or in-memory audio) with Whisper."""
+        if isinstance(chunk, bytes):
+            return self.openai_client.audio.transcriptions.create(
+                model="whisper-1",
+                file=("audio" + AUDIO_SUFFIX, chunk),
+                response_format="text"
+            )
+        with open(chunk, 'rb') as audio_file:
+            return self.openai_client.audio.transcriptions.create(
+                model="whisper-1",
+                file=audio_file,
+                response_format="text"
+            )
     
     def _get_video_duration(self, video_path):
         """
@@ -164,22 +505,15 @@ class VideoProcessor:
             float: Duration in seconds
         """
         try:
-            # Use subprocess to call ffprobe directly
-            cmd = [
-                'ffprobe', '-v', 'quiet', '-print_format', 'json',
-                '-show_streams', video_path
-            ]
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            if result.returncode == 0:
-                data = json.loads(result.stdout)
-                for stream in data.get('streams', []):
-                    if stream.get('codec_type') == 'video':
-                        duration = float(stream.get('duration', 0))
-                        if duration > 0:
-                            return duration
-            return 0
+            data = probe_video(video_path)
+            video_stream = first_stream(data, 'video')
+            duration = float((video_stream or {}).get('duration', 0))
+            if duration <= 0:
+                # Some containers (e.g. MKV, WebM) only report it on the format
+                duration = float(data.get('format', {}).get('duration', 0))
+            return duration if duration > 0 else 0
         except Exception as e:
-            print(f"Error getting video duration: {e}")
+            logger.warning("Error getting video duration: %s", e)
             return 0
     
     def get_video_info(self, video_path):
@@ -193,34 +527,26 @@ class VideoProcessor:
             dict: Video information
         """
         try:
-            # Use subprocess to call ffprobe directly
-            cmd = [
-                'ffprobe', '-v', 'quiet', '-print_format', 'json',
-                '-show_streams', video_path
-            ]
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            if result.returncode == 0:
-                data = json.loads(result.stdout)
-                video_stream = next((stream for stream in data.get('streams', []) if stream.get('codec_type') == 'video'), None)
+            video_stream = first_stream(probe_video(video_path), 'video')
+            
+            if video_stream:
+                # Parse frame rate safely
+                fps = 0
+                r_frame_rate = video_stream.get('r_frame_rate', '0/1')
+                if '/' in r_frame_rate:
+                    try:
+                        num, den = map(float, r_frame_rate.split('/'))
+                        fps = num / den if den != 0 else 0
+                    except:
+                        fps = 0
                 
-                if video_stream:
-                    # Parse frame rate safely
-                    fps = 0
-                    r_frame_rate = video_stream.get('r_frame_rate', '0/1')
-                    if '/' in r_frame_rate:
-                        try:
-                            num, den = map(float, r_frame_rate.split('/'))
-                            fps = num / den if den != 0 else 0
-                        except:
-                            fps = 0
-                    
-                    return {
-                        'duration': float(video_stream.get('duration', 0)),
-                        'width': int(video_stream.get('width', 0)),
-                        'height': int(video_stream.get('height', 0)),
-                        'fps': fps
-                    }
+                return {
+                    'duration': self._get_video_duration(video_path),
+                    'width': int(video_stream.get('width', 0)),
+                    'height': int(video_stream.get('height', 0)),
+                    'fps': fps
+                }
         except Exception as e:
-            print(f"Error getting video info: {e}")
+            logger.warning("Error getting video info: %s", e)
         
         return {'duration': 0, 'width': 0, 'height': 0, 'fps': 0}